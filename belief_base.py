@@ -2,6 +2,8 @@ import itertools
 
 # Class representing a belief, which consists of a formula and an associated priority
 class Belief:
+    __slots__ = ("formula", "priority")  # No per-instance __dict__, beliefs can be very numerous
+
     def __init__(self, formula, priority=0):
         self.formula = formula  # The logical formula representing the belief
         self.priority = priority  # The priority of the belief
@@ -22,11 +24,55 @@ class Belief:
     def get_atoms(self):
         return self.formula.get_atoms()
 
+# Class representing a standing query registered on a belief base
+class Subscription:
+    def __init__(self, query, callback):
+        self.query = query  # The formula being watched
+        self.callback = callback  # Called as callback(query, entailed) when the status flips
+        self.atoms = query.get_atoms()  # Atoms of the query
+        self.entailed = None  # Current entailment status
+        self.support = None  # Beliefs that entail the query on their own (when entailed)
+        self.witness = None  # Model of the base where the query is false (when not entailed)
+
+    # Check whether a change of the beliefs certainly leaves the entailment status unchanged
+    def unaffected_by(self, added, removed):
+        if self.entailed:
+            # Entailment is monotonic: it holds as long as the supporting beliefs are all still there
+            return self.support is not None and not any(belief in self.support for belief in removed)
+
+        if not added:
+            return True  # Removing beliefs cannot make a non-entailed query entailed
+        if self.witness is None:
+            return False
+
+        # The query stays non-entailed if the counter-model can be extended to satisfy the new beliefs
+        new_atoms = sorted(set().union(*(belief.get_atoms() for belief in added)) - set(self.witness))
+        for values in itertools.product([True, False], repeat=len(new_atoms)):
+            model = {**self.witness, **dict(zip(new_atoms, values))}
+            if all(belief.evaluate(model) for belief in added):
+                self.witness = model
+                return True
+        return False
+
+    # String representation of the subscription (used for printing)
+    def __str__(self):
+        return f"{self.query} [entailed={self.entailed}]"
+
 # Class representing a collection of beliefs (a belief base)
 class BeliefBase:
     def __init__(self):
-        self.beliefs = []  # List of beliefs in the belief base
+        self._beliefs = []  # List of beliefs in the belief base
+        self._beliefs_view = ()  # Read-only tuple of the beliefs, rebuilt after changes
+        self.version = 0  # Incremented whenever the beliefs change (used as a cache key)
         self.belief_counter = 0  # Counter to track the order of belief additions
+        self.simplifier = None  # Incremental clause simplifier, created by the first call to optimize()
+        self.simplified_beliefs = 0  # Number of beliefs already added to the simplifier
+        self.optimized_version = None  # Version the simplified clauses were computed for
+        self.optimized_clauses = {}  # Simplified clauses, each mapped to the beliefs it comes from
+        self.bound_key = None  # (version, atom order) the bound evaluators were computed for
+        self.bound_beliefs = []  # Compiled evaluators of the beliefs, as (function, projection) pairs
+        self.clause_cache = None  # Optional shared cache of compiled clauses (see registry.py)
+        self.subscriptions = []  # Standing queries notified when their entailment status changes
 
     # Expand the belief base by adding a new belief, optionally specifying its priority
     def expand(self, formula, priority=0):
@@ -37,7 +83,12 @@ class BeliefBase:
             priority = (5 * recency_score) + (3 * simplicity_score)
     
         # Add the belief to the belief base
-        self.beliefs.append(Belief(formula, priority))
+        belief = Belief(formula, priority)
+        self._append(belief)
+
+        # Keep the simplified clauses up to date once they have been computed
+        if self.simplifier is not None:
+            self.optimize()
 
         # Check if the belief base is consistent after adding the new belief
         if not self.is_consistent():
@@ -45,6 +96,63 @@ class BeliefBase:
 
         self.belief_counter += 1
 
+        # Re-evaluate the standing queries affected by the new belief
+        self._beliefs_changed([belief], [])
+
+    # The beliefs of the belief base, in order of addition (read-only, use expand() or assign to change them)
+    @property
+    def beliefs(self):
+        if self._beliefs_view is None:
+            self._beliefs_view = tuple(self._beliefs)
+        return self._beliefs_view
+
+    # Replace the beliefs of the belief base (e.g., with the result of a contraction)
+    @beliefs.setter
+    def beliefs(self, beliefs):
+        previous = self._beliefs
+        self._beliefs = []
+        self._beliefs_view = None
+        self.version += 1
+        self.simplified_beliefs = 0  # The simplified clauses must be rebuilt from scratch
+        for belief in beliefs:
+            self._append(belief)
+
+        # Re-evaluate the standing queries affected by the beliefs that were added or removed
+        if self.subscriptions:
+            kept = set(self._beliefs)
+            removed = [belief for belief in previous if belief not in kept]
+            previous = set(previous)
+            added = [belief for belief in self._beliefs if belief not in previous]
+            self._beliefs_changed(added, removed)
+
+    # Append a belief
+    def _append(self, belief):
+        self._beliefs.append(belief)
+        self._beliefs_view = None
+        self.version += 1
+
+    # Get the bitmask of a subset of beliefs (bit i is set if the i-th belief is in the subset)
+    def mask_of(self, subset):
+        positions = {id(belief): position for position, belief in enumerate(self._beliefs)}
+        mask = 0
+        for belief in subset:
+            mask |= 1 << positions[id(belief)]
+        return mask
+
+    # Get the set of beliefs represented by a bitmask
+    def subset_of(self, mask):
+        return {belief for position, belief in enumerate(self._beliefs) if mask >> position & 1}
+
+    # Get the total priority of the beliefs represented by a bitmask
+    def priority_of_mask(self, mask):
+        beliefs = self._beliefs
+        total = 0.0
+        while mask:
+            lowest = mask & -mask
+            total += beliefs[lowest.bit_length() - 1].priority
+            mask ^= lowest
+        return total
+
     # String representation of the belief base (used for printing)
     def __str__(self):
         status = "Consistent" if self.is_consistent() else "Inconsistent"
@@ -55,13 +163,27 @@ class BeliefBase:
     def __repr__(self):
         return f"BeliefBase({self.beliefs})"
     
+    # Get the compiled evaluators of all beliefs for a given atom order, as (function, projection) pairs
+    def compiled_beliefs(self, atoms):
+        # Reuse the evaluators bound for the previous call, e.g. when evaluating one model at a time
+        key = (self.version, atoms)
+        if key != self.bound_key:
+            positions = {atom: position for position, atom in enumerate(atoms)}
+            self.bound_beliefs = [bind_formula(belief.formula, positions) for belief in self._beliefs]
+            self.bound_key = key
+        return self.bound_beliefs
+
     # Evaluate all beliefs in the belief base for a given model
     def evaluate_all(self, model):
-        return all(belief.evaluate(model) for belief in self.beliefs)
+        atoms = tuple(model)
+        values = tuple(model.values())
+        return all(function(values, projection) for function, projection in self.compiled_beliefs(atoms))
     
     # Evaluate if any belief in the belief base is true for a given model
     def evaluate_any(self, model):
-        return any(belief.evaluate(model) for belief in self.beliefs)
+        atoms = tuple(model)
+        values = tuple(model.values())
+        return any(function(values, projection) for function, projection in self.compiled_beliefs(atoms))
     
     # Get all atomic propositions involved in the belief base
     def get_atoms(self):
@@ -82,10 +204,120 @@ class BeliefBase:
         
         return models
 
+    # Register a standing query, notified whenever its entailment status flips
+    def subscribe(self, query, callback):
+        """
+        Registers 'query' and returns its Subscription. After every expansion or replacement
+        of the beliefs (e.g., by a contraction), callback(query, entailed) is called if, and
+        only if, the base stopped or started entailing the query.
+        """
+        subscription = Subscription(query, callback)
+        self._evaluate_subscription(subscription)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    # Remove a standing query
+    def unsubscribe(self, subscription):
+        self.subscriptions.remove(subscription)
+
+    # Update the standing queries after beliefs were added and/or removed
+    def _beliefs_changed(self, added, removed):
+        for subscription in self.subscriptions:
+            if subscription.unaffected_by(added, removed):
+                continue
+            was_entailed = subscription.entailed
+            self._evaluate_subscription(subscription)
+            if subscription.entailed != was_entailed:
+                subscription.callback(subscription.query, subscription.entailed)
+
+    # Fully evaluate a standing query, recording what is needed to skip later updates
+    def _evaluate_subscription(self, subscription):
+        from entailment import check_entailment
+
+        subscription.support = None
+        subscription.witness = None
+        subscription.entailed = check_entailment(self, subscription.query)
+
+        if subscription.entailed:
+            # Keep the beliefs the query follows from, so that removing any other belief cannot change the answer
+            subscription.support = self._supporting_beliefs(subscription)
+        else:
+            # Keep a model of the base in which the query is false
+            atoms = tuple(sorted(self.get_atoms() | subscription.atoms))
+            evaluators = self.compiled_beliefs(atoms)
+            query, query_projection = bind_formula(subscription.query, {atom: i for i, atom in enumerate(atoms)})
+            for values in itertools.product([True, False], repeat=len(atoms)):
+                if not query(values, query_projection) and all(function(values, projection) for function, projection in evaluators):
+                    subscription.witness = dict(zip(atoms, values))
+                    break
+
+    # Get beliefs that entail an entailed standing query, using the origins of the simplified clauses
+    def _supporting_beliefs(self, subscription):
+        from entailment import literal_atom, refutes, to_cnf_obj
+
+        # Keep the simplified clauses connected to the query through shared atoms
+        clauses = self.optimize()
+        atoms = set(subscription.atoms)
+        remaining = list(clauses)
+        connected = []
+        grown = True
+        while grown:
+            grown = False
+            for clause in list(remaining):
+                clause_atoms = {literal_atom(literal) for literal in clause}
+                if clause_atoms & atoms:
+                    atoms |= clause_atoms
+                    connected.append(clause)
+                    remaining.remove(clause)
+                    grown = True
+
+        # If they entail the query on their own, the beliefs they were derived from do as well
+        origins = connected if remaining and refutes(set(connected), to_cnf_obj(Not(subscription.query))) else clauses
+        support = set()
+        for clause in origins:
+            support |= clauses[clause]
+        return support
+
+    # Get the CNF clauses of a formula, from the shared clause cache if the base has one
+    def clauses_of(self, formula):
+        if self.clause_cache is not None:
+            return self.clause_cache.clauses(formula)
+        from entailment import to_cnf_obj
+        return [frozenset(clause) for clause in to_cnf_obj(formula)]
+
+    # Compile the beliefs into a simplified clause set, reusing the work done for earlier beliefs
+    def optimize(self):
+        """
+        Returns the simplified CNF clauses of the belief base as a dict mapping each clause
+        to the beliefs it was derived from (see entailment.ClauseSimplifier).
+        If beliefs were only appended since the last call, just the new beliefs are
+        converted to CNF and simplified against the previous result.
+        """
+        from entailment import ClauseSimplifier
+
+        if self.optimized_version == self.version:
+            return self.optimized_clauses
+
+        if self.simplified_beliefs == 0:
+            # First call, or the beliefs were replaced: start from an empty clause set
+            self.simplifier = ClauseSimplifier()
+
+        # Only the beliefs appended since the last call need to be compiled and simplified
+        for belief in self._beliefs[self.simplified_beliefs:]:
+            for clause in self.clauses_of(belief.formula):
+                self.simplifier.add(clause, frozenset([belief]))
+        self.simplified_beliefs = len(self._beliefs)
+
+        self.optimized_clauses = self.simplifier.result()
+        self.optimized_version = self.version
+        return self.optimized_clauses
+
     # Check if the belief base is consistent (there exists at least one model that satisfies all beliefs)
     def is_consistent(self):
-        for model in self.generate_all_models():
-            if self.evaluate_all(model):
+        atoms = tuple(sorted(self.get_atoms()))  # Same atom order as generate_all_models
+        evaluators = self.compiled_beliefs(atoms)
+        for values in itertools.product([True, False], repeat=len(atoms)):
+            if all(function(values, projection) for function, projection in evaluators):
                 return True  # At least one model satisfies all beliefs
         return False  # No model satisfies all beliefs
 
@@ -106,6 +338,10 @@ class Atom:
     def evaluate(self, model):
         return model[self.name]
     
+    # Generate Python source evaluating the atom over a positional model tuple 'm', through the projection 'p'
+    def to_source(self, index):
+        return f"m[p[{index[self.name]}]]"
+
     # Get the atoms that appear in the atomic proposition (itself)
     def get_atoms(self):
         return {self.name}
@@ -127,13 +363,19 @@ class And:
     def evaluate(self, model):
         return all(op.evaluate(model) for op in self.operands)
     
+    # Generate Python source evaluating the AND operation over a positional model tuple 'm'
+    def to_source(self, index):
+        if not self.operands:
+            return "True"
+        return "(" + " and ".join(op.to_source(index) for op in self.operands) + ")"
+
     # Get all atoms involved in the AND operation
     def get_atoms(self):
         atoms = set()
         for operand in self.operands:
             if isinstance(operand, Atom):
                 atoms.add(operand.name)
-            elif isinstance(operand, (And, Or, Not, Implies)):
+            elif isinstance(operand, (And, Or, Not, Implies, Biconditional)):
                 atoms.update(operand.get_atoms())
         return atoms
 
@@ -154,13 +396,19 @@ class Or:
     def evaluate(self, model):
         return any(op.evaluate(model) for op in self.operands)
     
+    # Generate Python source evaluating the OR operation over a positional model tuple 'm'
+    def to_source(self, index):
+        if not self.operands:
+            return "False"
+        return "(" + " or ".join(op.to_source(index) for op in self.operands) + ")"
+
     # Get all atoms involved in the OR operation
     def get_atoms(self):
         atoms = set()
         for operand in self.operands:
             if isinstance(operand, Atom):
                 atoms.add(operand.name)
-            elif isinstance(operand, (And, Or, Not, Implies)):
+            elif isinstance(operand, (And, Or, Not, Implies, Biconditional)):
                 atoms.update(operand.get_atoms())
         return atoms
 
@@ -181,12 +429,16 @@ class Not:
     def evaluate(self, model):
         return not self.operand.evaluate(model)
     
+    # Generate Python source evaluating the NOT operation over a positional model tuple 'm'
+    def to_source(self, index):
+        return f"(not {self.operand.to_source(index)})"
+
     # Get all atoms involved in the NOT operation
     def get_atoms(self):
         atoms = set()
         if isinstance(self.operand, Atom):
             atoms.add(self.operand.name)
-        elif isinstance(self.operand, (And, Or, Not, Implies)):
+        elif isinstance(self.operand, (And, Or, Not, Implies, Biconditional)):
             atoms.update(self.operand.get_atoms())
         return atoms
 
@@ -208,16 +460,20 @@ class Implies:
     def evaluate(self, model):
         return not self.antecedent.evaluate(model) or self.consequent.evaluate(model)
     
+    # Generate Python source evaluating the IMPLIES operation over a positional model tuple 'm'
+    def to_source(self, index):
+        return f"((not {self.antecedent.to_source(index)}) or {self.consequent.to_source(index)})"
+
     # Get all atoms involved in the IMPLIES operation
     def get_atoms(self):
         atoms = set()
         if isinstance(self.antecedent, Atom):
             atoms.add(self.antecedent.name)
-        elif isinstance(self.antecedent, (And, Or, Not, Implies)):
+        elif isinstance(self.antecedent, (And, Or, Not, Implies, Biconditional)):
             atoms.update(self.antecedent.get_atoms())
         if isinstance(self.consequent, Atom):
             atoms.add(self.consequent.name)
-        elif isinstance(self.consequent, (And, Or, Not, Implies)):
+        elif isinstance(self.consequent, (And, Or, Not, Implies, Biconditional)):
             atoms.update(self.consequent.get_atoms())
         return atoms
 
@@ -239,7 +495,47 @@ class Biconditional:
     def evaluate(self, model):
         return self.left.evaluate(model) == self.right.evaluate(model)
 
+    # Generate Python source evaluating the BICONDITIONAL operation over a positional model tuple 'm'
+    def to_source(self, index):
+        return f"(bool({self.left.to_source(index)}) == bool({self.right.to_source(index)}))"
+
     # Get all atoms involved in the BICONDITIONAL operation
     def get_atoms(self):
         return self.left.get_atoms().union(self.right.get_atoms())
 
+# Compile a formula into a flat Python function over a positional model tuple
+def compile_formula(formula):
+    """
+    Returns (atoms, function): the atoms of 'formula' in sorted order, and a function taking
+    a tuple of truth values 'm' and a projection tuple 'p' and returning the truth value of
+    the formula. The k-th atom is read from m[p[k]], so one compiled function serves every
+    atom order (see bind_formula).
+    The formula is turned into a single Python expression, so evaluating it costs one call
+    instead of one evaluate() call per node and one dict lookup per atom. The compiled
+    function is cached on the formula node.
+    """
+    compiled = formula.__dict__.get("_compiled")
+    if compiled is not None:
+        return compiled
+
+    atoms = tuple(sorted(formula.get_atoms()))
+    index = {atom: position for position, atom in enumerate(atoms)}
+    try:
+        source = formula.to_source(index)
+        function = eval(compile(f"lambda m, p: {source}", "<formula>", "eval"))
+    except (SyntaxError, RecursionError, MemoryError):
+        # Formulas nested too deeply for the Python parser fall back to recursive evaluation
+        function = lambda m, p: formula.evaluate({atom: m[position] for atom, position in zip(atoms, p)})
+
+    formula.__dict__["_compiled"] = (atoms, function)
+    return atoms, function
+
+# Function to get the compiled evaluator of a formula and its projection for a given atom order
+def bind_formula(formula, positions):
+    """
+    'positions' maps each atom to its position in the truth value tuples that will be evaluated.
+    Returns (function, projection) such that function(values, projection) is the truth value of
+    the formula.
+    """
+    atoms, function = compile_formula(formula)
+    return function, tuple(positions[atom] for atom in atoms)
@@ -1,3 +1,6 @@
+import threading
+import weakref
+from collections import OrderedDict
 from itertools import chain, combinations
 from belief_base import *
 from entailment import * 
@@ -18,48 +21,78 @@ def total_priority(subset):
     """
     return sum(belief.priority for belief in subset)
 
-# Check if a belief subset is a *maximal* subset that does NOT entail the formula
-def is_maximal_non_entailing(subset, full_base, formula):
-    """
-    Determines whether 'subset' does NOT entail 'formula' and is maximal w.r.t. this property.
-    I.e., you cannot add more beliefs from 'full_base' without causing entailment of 'formula'.
-    """
-    # If the current subset entails the formula, it's not valid
-    if entails_cont(subset, formula):
-        return False
-    # Check that no strictly larger subset (of full_base) also avoids entailment
-    for other in powerset(full_base):
-        other = set(other)
-        if set(subset) < other and not entails_cont(other, formula):
-            return False
-    return True
-
 def compute_remainders(belief_base, formula):
     """
     Computes all 'remainders' of the belief base after contracting by 'formula'.
     A remainder is a maximal subset that does not entail 'formula'.
     """
-    remainders = []
+    return [belief_base.subset_of(mask) for mask in compute_remainder_masks(belief_base, formula)]
+
+# Compute the remainders as bitmasks over the positions of the beliefs in the base
+def compute_remainder_masks(belief_base, formula):
+    """
+    Same as compute_remainders, but each remainder is returned as a bitmask
+    (bit i is set if the i-th belief of the base is kept).
+    """
+    return compute_package_remainder_masks(belief_base, [formula])
+
+# Compute the remainders for a package of formulas, as bitmasks
+def compute_package_remainder_masks(belief_base, formulas):
+    """
+    Computes the maximal subsets of the belief base that entail none of 'formulas',
+    as bitmasks over the positions of the beliefs.
+    Every belief and every negated formula is converted to CNF once, and each subset is
+    checked against these shared clauses. Since entailment is monotonic, a subset that
+    extends an entailing subset by one belief entails too and is not checked again, and a
+    non-entailing subset is maximal iff adding any single missing belief makes it entail.
+    """
     beliefs = list(belief_base.beliefs)
+    formulas = list(formulas)
+    described = formulas[0] if len(formulas) == 1 else ", ".join(str(f) for f in formulas)
     print("\n--- Computing Remainders ---")
-    print(f"Formula to contract (¬entail): {formula}")
+    print(f"Formula to contract (¬entail): {described}")
     print(f"Beliefs in base: {[b.formula for b in beliefs]}")
 
-    for subset in powerset(beliefs):
-        subset = set(subset)
+    # Compile the beliefs and the negated formulas once
+    belief_clauses = [
+        {clause for clause in belief_base.clauses_of(belief.formula) if not is_tautological_clause(clause)}
+        for belief in beliefs
+    ]
+    negated_formulas = [to_cnf_obj(Not(formula)) for formula in formulas]
 
-        try:
-            result = entails_cont(subset, formula)
-        except Exception as e:
-            print(f"Error in entailment check: {e}")
-            continue
+    # Check every subset once, in the same order as powerset()
+    tested = []
+    entailing = set()
+    non_entailing = set()
+    for positions in powerset(range(len(beliefs))):
+        subset = {beliefs[position] for position in positions}
+        mask = sum(1 << position for position in positions)
 
+        if any(mask & ~(1 << position) in entailing for position in positions):
+            result = True  # A smaller subset already entails one of the formulas
+        else:
+            try:
+                kb_clauses = set().union(*(belief_clauses[position] for position in positions))
+                result = any(refutes(kb_clauses, query_clauses) for query_clauses in negated_formulas)
+            except Exception as e:
+                print(f"Error in entailment check: {e}")
+                continue
+
+        tested.append((mask, subset, result))
+        (entailing if result else non_entailing).add(mask)
+
+    remainders = []
+    for mask, subset, result in tested:
         print(f"Testing subset: {[str(b.formula) for b in subset]}")
-        print(f" -> Entails {formula}? {result}")
+        print(f" -> Entails {described}? {result}")
 
-        if is_maximal_non_entailing(subset, beliefs, formula):
+        maximal = not result and all(
+            mask >> position & 1 or (mask | 1 << position) not in non_entailing
+            for position in range(len(beliefs))
+        )
+        if maximal:
             print(" --> Valid remainder (maximal & non-entailing)\n")
-            remainders.append(subset)
+            remainders.append(mask)
         else:
             print(" --> Rejected (not maximal or entails formula)\n")
 
@@ -99,6 +132,137 @@ def select_remainders_by_priority(remainders):
     
     return best_remainders
 
+# Select best remainders given as bitmasks, using the priority column of the belief base
+def select_remainder_masks_by_priority(belief_base, remainders):
+    """
+    Bitmask counterpart of select_remainders_by_priority: keeps the remainders with the
+    highest total priority and, among those, the ones with the most beliefs.
+    Totals are summed from the belief base's priority array and sizes are bit counts.
+    """
+    if not remainders:
+        return []
+
+    scored = [(mask, belief_base.priority_of_mask(mask)) for mask in remainders]
+    max_priority = max(score for _, score in scored)
+    top_priority_masks = [mask for mask, score in scored if score == max_priority]
+
+    max_len = max(bin(mask).count("1") for mask in top_priority_masks)
+    return [mask for mask in top_priority_masks if bin(mask).count("1") == max_len]
+
+# Build the cheap syntactic canonical form of a query (sorted, flattened, deduplicated CNF)
+def canonical_query(formula):
+    """
+    Returns a hashable canonical form of 'formula': its CNF clauses with tautological
+    clauses dropped, literals sorted inside each clause and the clauses sorted and
+    deduplicated. Formulas that only differ in operand order or repetition
+    (e.g. A ∧ B and B ∧ A) share the same canonical form.
+    """
+    clauses = set()
+    for clause in to_cnf_obj(formula):
+        if any(negate(literal) in clause for literal in clause):
+            continue  # Tautological clause, always true
+        clauses.add(tuple(sorted(clause)))
+    return tuple(sorted(clauses))
+
+# Cache of contraction results keyed on the belief base version and the canonical query
+class ContractionCache:
+    """
+    Memoizes partial meet contraction results.
+    Entries are kept per belief base, for its current version only, and keyed on the
+    canonical form of the query. Bases are held weakly, so a base that is no longer used
+    is dropped from the cache with its results. On a syntactic miss, the query is compared
+    for logical equivalence against the most recent queries cached for the same base,
+    so equivalent formulas (e.g. A ∧ B and B ∧ A) reuse the same result.
+    """
+    def __init__(self, max_entries=128, equivalence_window=8):
+        self.max_entries = max_entries  # Maximum number of cached contraction results per base
+        self.equivalence_window = equivalence_window  # How many recent queries to test for equivalence
+        self.bases = weakref.WeakKeyDictionary()  # Belief base -> (version, canonical query -> contracted beliefs)
+        self.hits = 0  # Lookups answered by the syntactic key
+        self.equivalence_hits = 0  # Lookups answered by an equivalence check
+        self.misses = 0  # Lookups that required a full contraction
+        self.lock = threading.Lock()  # Contractions may run on several threads (see registry.py)
+
+    # Look up a cached contraction result, returning None on a miss
+    def lookup(self, belief_base, formula):
+        version = belief_base.version
+        canonical = canonical_query(formula)
+        with self.lock:
+            entries = self._entries(belief_base, version)
+            if canonical in entries:
+                entries.move_to_end(canonical)
+                self.hits += 1
+                return set(entries[canonical])
+
+            # Syntactic miss: collect the most recent queries cached for this version of the base
+            candidates = list(reversed(entries))[:self.equivalence_window]
+
+        # The equivalence checks run outside the lock, so other threads are not held up
+        for cached in candidates:
+            if self._equivalent(cached, canonical):
+                with self.lock:
+                    entries = self._entries(belief_base, version)
+                    if cached not in entries:
+                        continue  # Evicted in the meantime
+                    entries.move_to_end(cached)
+                    entries[canonical] = entries[cached]  # Alias the equivalent query
+                    self._evict(entries)
+                    self.equivalence_hits += 1
+                    return set(entries[canonical])
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    # Store the result of contracting 'belief_base' by 'formula', computed for a given version of the base
+    def store(self, belief_base, formula, contracted, version):
+        canonical = canonical_query(formula)
+        with self.lock:
+            if version != belief_base.version:
+                return  # The base changed while the result was computed
+            entries = self._entries(belief_base, version)
+            if not entries:
+                self.bases[belief_base] = (version, entries)
+            entries[canonical] = frozenset(contracted)
+            entries.move_to_end(canonical)
+            self._evict(entries)
+
+    # Drop all cached results
+    def clear(self):
+        with self.lock:
+            self.bases = weakref.WeakKeyDictionary()
+            self.hits = 0
+            self.equivalence_hits = 0
+            self.misses = 0
+
+    # Get the cached results of a base for a version (called with the lock held)
+    def _entries(self, belief_base, version):
+        cached_version, entries = self.bases.get(belief_base, (None, None))
+        if cached_version != version:
+            return OrderedDict()  # Results of older versions are stale
+        return entries
+
+    # Evict the least recently used entries beyond the size limit
+    def _evict(self, entries):
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    # Check whether two canonical queries are logically equivalent using resolution
+    @staticmethod
+    def _equivalent(canonical1, canonical2):
+        def entails(premises, conclusion):
+            # The premises entail every clause of the conclusion iff adding its negation is unsatisfiable
+            for clause in conclusion:
+                negated = {frozenset({negate(literal)}) for literal in clause}
+                if not resolution({frozenset(c) for c in premises} | negated):
+                    return False
+            return True
+
+        return entails(canonical1, canonical2) and entails(canonical2, canonical1)
+
+# Shared contraction cache used by partial_meet_contraction
+contraction_cache = ContractionCache()
+
 # Main contraction function (partial meet contraction)
 def partial_meet_contraction(belief_base, formula):
     """
@@ -106,17 +270,66 @@ def partial_meet_contraction(belief_base, formula):
     It removes just enough beliefs to ensure 'formula' is no longer entailed,
     keeping as much high-priority information as possible.
     The 'formula' should be a symbolic Formula object, not a string.
+    Results are memoized in 'contraction_cache', so repeated or equivalent
+    contractions of an unchanged base are answered by a lookup.
     """
-    remainders = compute_remainders(belief_base, formula)
+    version = belief_base.version
+    cached = contraction_cache.lookup(belief_base, formula)
+    if cached is not None:
+        return cached
+
+    remainders = compute_remainder_masks(belief_base, formula)
     
     if not remainders:
         print("No valid remainders found. Returning the original belief base.")
-        return belief_base.beliefs
+        contraction_cache.store(belief_base, formula, belief_base.beliefs, version)
+        return set(belief_base.beliefs)
 
-    selected = select_remainders_by_priority(remainders)
+    contracted = meet_of_best_remainders(belief_base, remainders)
+    contraction_cache.store(belief_base, formula, contracted, version)
+    return contracted
+
+# Package contraction: contract several formulas in one pass
+def package_contraction(belief_base, formulas):
+    """
+    Performs partial meet contraction of the belief base by a whole set of formulas at once:
+    the remainders are the maximal subsets that entail none of 'formulas'.
+    Unlike contracting the formulas one after the other, the result does not depend on
+    their order, and the remainders are computed once over a single compiled base.
+    Tautologies cannot be contracted and are ignored.
+    """
+    empty_base = BeliefBase()
+    contractible = []
+    for formula in formulas:
+        if check_entailment(empty_base, formula):
+            print(f"Skipping {formula}: tautologies cannot be contracted.")
+        else:
+            contractible.append(formula)
+
+    if not contractible:
+        return set(belief_base.beliefs)
+
+    remainders = compute_package_remainder_masks(belief_base, contractible)
+
+    if not remainders:
+        print("No valid remainders found. Returning the original belief base.")
+        return set(belief_base.beliefs)
+
+    return meet_of_best_remainders(belief_base, remainders)
+
+# Intersect the best remainders (given as bitmasks) into the contracted set of beliefs
+def meet_of_best_remainders(belief_base, remainders):
+    """
+    Selects the best remainders by priority and returns the intersection of them
+    as a set of beliefs, warning if it is inconsistent.
+    """
+    selected = select_remainder_masks_by_priority(belief_base, remainders)
     
     # The contraction result is the intersection of the selected remainders
-    contracted = set.intersection(*map(set, selected))
+    intersection = selected[0]
+    for mask in selected[1:]:
+        intersection &= mask
+    contracted = belief_base.subset_of(intersection)
 
     # Check consistency
     new_belief_base = BeliefBase()
@@ -0,0 +1,404 @@
+import argparse
+import contextlib
+import io
+import itertools
+import random
+import time
+from belief_base import BeliefBase, Belief, Atom, And, Or, Not, Implies, Biconditional, bind_formula
+from contraction import (
+    powerset, compute_remainders, select_remainders_by_priority,
+    partial_meet_contraction, package_contraction, contraction_cache,
+)
+from entailment import check_entailment, to_cnf_obj, resolution
+
+# Registered backends: name -> function(belief_base, query)
+# Entailment backends return a bool, contraction backends return the beliefs that are kept
+ENTAILMENT_BACKENDS = {}
+CONTRACTION_BACKENDS = {}
+
+# Register an entailment backend to be checked against the truth-table oracle
+def register_entailment_backend(name, function):
+    ENTAILMENT_BACKENDS[name] = function
+
+# Register a contraction backend to be checked against the truth-table oracle
+def register_contraction_backend(name, function):
+    CONTRACTION_BACKENDS[name] = function
+
+# Truth-table oracle for entailment, using the brute-force semantics of the belief base
+def oracle_entails(belief_base, query):
+    """
+    Every model of the belief base (from generate_all_models, extended over the atoms
+    that only occur in the query) must satisfy the query. Beliefs are evaluated with
+    the recursive evaluate(), so the oracle does not depend on any compiled path.
+    """
+    extra_atoms = sorted(query.get_atoms() - belief_base.get_atoms())
+    for model in belief_base.generate_all_models():
+        if not all(belief.evaluate(model) for belief in belief_base.beliefs):
+            continue
+        for values in itertools.product([True, False], repeat=len(extra_atoms)):
+            if not query.evaluate({**model, **dict(zip(extra_atoms, values))}):
+                return False
+    return True
+
+# Truth-table oracle for consistency: some model of the atoms satisfies every belief
+def oracle_consistent(belief_base):
+    return any(all(belief.evaluate(model) for belief in belief_base.beliefs)
+               for model in belief_base.generate_all_models())
+
+# Truth-table oracle for partial meet contraction
+def oracle_contraction(belief_base, query):
+    """
+    Remainders are found by checking every subset with oracle_entails, then selected by
+    priority and intersected exactly as partial_meet_contraction does.
+    """
+    beliefs = list(belief_base.beliefs)
+    non_entailing = []
+    for subset in powerset(beliefs):
+        candidate = BeliefBase()
+        candidate.beliefs = list(subset)
+        if not oracle_entails(candidate, query):
+            non_entailing.append(set(subset))
+    remainders = [s for s in non_entailing if not any(s < other for other in non_entailing)]
+    if not remainders:
+        return set(beliefs)
+    return set.intersection(*select_remainders_by_priority(remainders))
+
+# Entailment by resolution over the raw (unsimplified) CNF clauses of the beliefs
+def raw_resolution_entails(belief_base, query):
+    clauses = [clause for belief in belief_base.beliefs for clause in to_cnf_obj(belief.formula)]
+    clauses += to_cnf_obj(Not(query))
+    return resolution({frozenset(clause) for clause in clauses})
+
+# Entailment by model checking with the compiled evaluators
+def compiled_model_entails(belief_base, query):
+    atoms = tuple(sorted(belief_base.get_atoms() | query.get_atoms()))
+    evaluators = belief_base.compiled_beliefs(atoms)
+    compiled_query, query_projection = bind_formula(query, {atom: i for i, atom in enumerate(atoms)})
+    for values in itertools.product([True, False], repeat=len(atoms)):
+        if all(function(values, projection) for function, projection in evaluators) and not compiled_query(values, query_projection):
+            return False
+    return True
+
+# Contraction through compute_remainders and the set-based priority selection
+def remainder_contraction(belief_base, query):
+    remainders = compute_remainders(belief_base, query)
+    if not remainders:
+        return set(belief_base.beliefs)
+    return set.intersection(*select_remainders_by_priority(remainders))
+
+register_entailment_backend("check_entailment", check_entailment)
+register_entailment_backend("raw_resolution", raw_resolution_entails)
+register_entailment_backend("compiled_models", compiled_model_entails)
+register_contraction_backend("compute_remainders", remainder_contraction)
+register_contraction_backend("partial_meet_contraction", partial_meet_contraction)
+register_contraction_backend("package_contraction", lambda base, query: package_contraction(base, [query]))
+
+# Class representing one generated test case: prioritized beliefs and a query
+class Case:
+    def __init__(self, beliefs, query):
+        self.beliefs = beliefs  # List of (formula, priority) pairs
+        self.query = query  # Formula to check for entailment and to contract
+
+    # Build a fresh belief base for the case (without expand(), so priorities are kept as given)
+    def build_base(self):
+        base = BeliefBase()
+        base.beliefs = [Belief(formula, priority) for formula, priority in self.beliefs]
+        return base
+
+    # Size of the case, used to pick the smallest failing case during minimization
+    def size(self):
+        return sum(len(str(formula)) for formula, _ in self.beliefs) + len(str(self.query))
+
+    def __str__(self):
+        beliefs = ", ".join(f"{formula} [priority={priority}]" for formula, priority in self.beliefs)
+        return f"Beliefs: {beliefs or '∅'} | Query: {self.query}"
+
+# Class representing a disagreement between a backend and the oracle, or a failed AGM check
+class Failure:
+    def __init__(self, backend, check, case, minimized, details):
+        self.backend = backend  # Name of the backend that failed
+        self.check = check  # Name of the failed check
+        self.case = case  # The generated case
+        self.minimized = minimized  # The smallest case found that still fails the same check
+        self.details = details  # Description of the failure on the minimized case
+
+    def __str__(self):
+        return f"[{self.backend}] {self.check}: {self.details}\n  minimized: {self.minimized}\n  original: {self.case}"
+
+# Class collecting the results of a harness run
+class HarnessReport:
+    def __init__(self, seed, cases):
+        self.seed = seed  # Seed of the random generator
+        self.cases = cases  # Number of generated cases
+        self.failures = []  # List of Failure objects
+        self.timings = {}  # Backend name -> total time spent, in seconds
+        self.cache_stats = {}  # Contraction cache counters at the end of the run
+
+    # Relative speedup of every backend over its oracle (oracle time / backend time)
+    def speedups(self):
+        speedups = {}
+        for name, seconds in self.timings.items():
+            if name.startswith("oracle"):
+                continue
+            oracle = "oracle_entailment" if name in ENTAILMENT_BACKENDS else "oracle_contraction"
+            speedups[name] = self.timings.get(oracle, 0.0) / seconds if seconds else float("inf")
+        return speedups
+
+    def __str__(self):
+        lines = [f"Seed {self.seed}: {self.cases} cases, {len(self.failures)} failures"]
+        for name, speedup in sorted(self.speedups().items()):
+            lines.append(f"  {name}: {self.timings[name]:.3f}s ({speedup:.2f}x vs oracle)")
+        if self.cache_stats:
+            lines.append("  contraction cache: " + ", ".join(f"{count} {name}" for name, count in self.cache_stats.items()))
+        lines.extend(str(failure) for failure in self.failures)
+        return "\n".join(lines)
+
+# Generate a random formula over the given atoms with binary connectives, as produced by the parser
+def random_formula(rng, atoms, depth):
+    if depth == 0 or rng.random() < 0.3:
+        return Atom(rng.choice(atoms))
+    kind = rng.choice(["not", "and", "or", "implies", "biconditional"])
+    if kind == "not":
+        return Not(random_formula(rng, atoms, depth - 1))
+    left, right = random_formula(rng, atoms, depth - 1), random_formula(rng, atoms, depth - 1)
+    return {"and": And, "or": Or, "implies": Implies, "biconditional": Biconditional}[kind](left, right)
+
+# Generate a random case small enough for the truth-table oracle
+def random_case(rng, max_atoms=3, max_beliefs=4, max_depth=2):
+    atoms = [chr(ord("A") + i) for i in range(rng.randint(1, max_atoms))]
+    beliefs = [
+        (random_formula(rng, atoms, max_depth), rng.randint(1, 5))  # Integer priorities keep sums exact
+        for _ in range(rng.randint(0, max_beliefs))
+    ]
+    return Case(beliefs, random_formula(rng, atoms, max_depth))
+
+# Rewrite a formula into a logically equivalent one (swapped operands, double negation)
+def equivalent_variant(formula):
+    if isinstance(formula, Atom):
+        return Not(Not(formula))
+    if isinstance(formula, Not):
+        return Not(equivalent_variant(formula.operand))
+    if isinstance(formula, (And, Or)):
+        return type(formula)(*reversed([equivalent_variant(op) for op in formula.operands]))
+    if isinstance(formula, Implies):
+        return Implies(equivalent_variant(formula.antecedent), equivalent_variant(formula.consequent))
+    if isinstance(formula, Biconditional):
+        return Biconditional(equivalent_variant(formula.right), equivalent_variant(formula.left))
+    raise TypeError(f"Unsupported formula type: {type(formula)}")
+
+# Rewrite a formula φ into (φ ∨ p) ∧ (φ ∨ ¬p), which is equivalent but has a different CNF
+def case_split_variant(formula, atom):
+    return And(Or(formula, Atom(atom)), Or(formula, Not(Atom(atom))))
+
+# Get the immediate sub-formulas of a formula (used to shrink failing cases)
+def subformulas(formula):
+    if isinstance(formula, Not):
+        return [formula.operand]
+    if isinstance(formula, (And, Or)):
+        return list(formula.operands)
+    if isinstance(formula, Implies):
+        return [formula.antecedent, formula.consequent]
+    if isinstance(formula, Biconditional):
+        return [formula.left, formula.right]
+    return []
+
+# Get the candidate cases one shrinking step away from a case
+def shrink_candidates(case):
+    for i in range(len(case.beliefs)):
+        yield Case(case.beliefs[:i] + case.beliefs[i + 1:], case.query)
+    for i, (formula, priority) in enumerate(case.beliefs):
+        for smaller in subformulas(formula):
+            yield Case(case.beliefs[:i] + [(smaller, priority)] + case.beliefs[i + 1:], case.query)
+    for smaller in subformulas(case.query):
+        yield Case(case.beliefs, smaller)
+
+# Greedily shrink a failing case while it keeps failing
+def minimize(case, check):
+    """
+    'check' returns a description of the failure for a case, or None if the case passes.
+    Beliefs are dropped and formulas replaced by their sub-formulas until no smaller
+    case fails anymore.
+    """
+    details = check(case)
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for candidate in sorted(shrink_candidates(case), key=Case.size):
+            candidate_details = check(candidate)
+            if candidate_details is not None:
+                case, details, shrunk = candidate, candidate_details, True
+                break
+    return case, details
+
+# Check an entailment backend against the oracle on a case
+def entailment_check(backend):
+    def check(case):
+        expected = oracle_entails(case.build_base(), case.query)
+        try:
+            actual = backend(case.build_base(), case.query)
+        except Exception as e:
+            return f"raised {type(e).__name__}: {e}"
+        if actual != expected:
+            return f"entails={actual}, oracle says {expected}"
+        return None
+    return check
+
+# Get the sorted positions of beliefs in a base (-1 for beliefs that are not in it), to compare across bases
+def positions(base, beliefs):
+    index = {id(belief): position for position, belief in enumerate(base.beliefs)}
+    return sorted(index.get(id(belief), -1) for belief in beliefs)
+
+# Check a contraction backend against the oracle and the AGM contraction postulates on a case
+def contraction_check(backend):
+    def check(case):
+        base = case.build_base()
+        expected = positions(base, oracle_contraction(base, case.query))
+        # The variant is contracted on a fresh base, so a cached result cannot answer it
+        variant_base = case.build_base()
+        try:
+            result = set(backend(base, case.query))
+            variant = positions(variant_base, backend(variant_base, equivalent_variant(case.query)))
+        except Exception as e:
+            return f"raised {type(e).__name__}: {e}"
+        actual = positions(base, result)
+
+        if -1 in actual:
+            return "Inclusion failed: the result contains beliefs outside the original base"
+        if actual != expected:
+            return f"kept beliefs {actual}, oracle keeps {expected}"
+        kept = BeliefBase()
+        kept.beliefs = [base.beliefs[position] for position in actual]
+        if not oracle_entails(BeliefBase(), case.query) and oracle_entails(kept, case.query):
+            return "Success failed: the result still entails the query"
+        if not oracle_entails(base, case.query) and len(actual) != len(base.beliefs):
+            return "Vacuity failed: contracting a non-entailed query changed the base"
+        if oracle_consistent(base) and not oracle_consistent(kept):
+            return "Consistency failed: contracting a consistent base made it inconsistent"
+        if variant != actual:
+            return "Extensionality failed: an equivalent query gave a different result"
+        return None
+    return check
+
+# Check a contraction backend on a sequence of contractions of the same belief base
+def repeated_contraction_check(backend, queries):
+    """
+    Contracts one base by the case query and then by each of 'queries', comparing every
+    result with the oracle. Repeated and equivalent queries are answered from the
+    contraction cache, so this exercises its syntactic and equivalence hits.
+    """
+    def check(case):
+        base = case.build_base()
+        for query in [case.query] + queries:
+            expected = oracle_contraction(base, query)
+            try:
+                actual = set(backend(base, query))
+            except Exception as e:
+                return f"raised {type(e).__name__}: {e} (query {query})"
+            if actual != expected:
+                return f"contracting by {query} after earlier contractions disagrees with the oracle"
+        return None
+    return check
+
+# Run the differential harness
+def run_harness(seed=0, cases=100, max_atoms=3, max_beliefs=4, max_depth=2,
+                entailment_backends=None, contraction_backends=None):
+    """
+    Generates 'cases' random cases from 'seed' and runs every entailment and contraction
+    backend on each, comparing the answers with the truth-table oracles and checking the
+    AGM contraction postulates. Failing cases are minimized. Returns a HarnessReport with
+    the failures and the time spent by each backend and oracle.
+    """
+    entailment_backends = ENTAILMENT_BACKENDS if entailment_backends is None else entailment_backends
+    contraction_backends = CONTRACTION_BACKENDS if contraction_backends is None else contraction_backends
+    rng = random.Random(seed)
+    report = HarnessReport(seed, cases)
+    failed = set()  # (backend, check) pairs already reported
+
+    def timed(name, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            report.timings[name] = report.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def report_failure(name, kind, case, check):
+        details = check(case)
+        if details is None or (name, kind) in failed:
+            return
+        failed.add((name, kind))
+        minimized, minimized_details = minimize(case, check)
+        report.failures.append(Failure(name, kind, case, minimized, minimized_details))
+
+    # Silence the progress output of contraction and expansion
+    with contextlib.redirect_stdout(io.StringIO()):
+        contraction_cache.clear()
+        for _ in range(cases):
+            case = random_case(rng, max_atoms, max_beliefs, max_depth)
+
+            expected = timed("oracle_entailment", oracle_entails, case.build_base(), case.query)
+            for name, backend in entailment_backends.items():
+                try:
+                    actual = timed(name, backend, case.build_base(), case.query)
+                except Exception:
+                    actual = None
+                if actual != expected:
+                    report_failure(name, "entailment", case, entailment_check(backend))
+
+            base = case.build_base()
+            expected = timed("oracle_contraction", oracle_contraction, base, case.query)
+            for name, backend in contraction_backends.items():
+                try:
+                    actual = set(timed(name, backend, base, case.query))
+                except Exception:
+                    actual = None
+                if actual != expected:
+                    report_failure(name, "contraction", case, contraction_check(backend))
+                else:
+                    # Same answer as the oracle, check the postulates that compare several calls
+                    report_failure(name, "AGM postulates", case, contraction_check(backend))
+
+            # Contract a fresh base by several queries in a row: new ones, repeated ones and equivalent ones
+            atoms = sorted(base.get_atoms() | case.query.get_atoms())
+            new_queries = [random_formula(rng, atoms, max_depth) for _ in range(2)]
+            queries = new_queries + [
+                case_split_variant(case.query, rng.choice(atoms)),
+                equivalent_variant(new_queries[0]),
+                new_queries[1],
+            ]
+            base = case.build_base()  # Only used by the oracle
+            expected = [positions(base, timed("oracle_contraction", oracle_contraction, base, query))
+                        for query in [case.query] + queries]
+            for name, backend in contraction_backends.items():
+                repeated_base = case.build_base()
+                try:
+                    actual = [positions(repeated_base, timed(name, backend, repeated_base, query))
+                              for query in [case.query] + queries]
+                except Exception:
+                    actual = None
+                if actual != expected:
+                    report_failure(name, "repeated contractions", case, repeated_contraction_check(backend, queries))
+
+        report.cache_stats = {
+            "hits": contraction_cache.hits,
+            "equivalence hits": contraction_cache.equivalence_hits,
+            "misses": contraction_cache.misses,
+        }
+    return report
+
+# Command line entry point
+def main():
+    parser = argparse.ArgumentParser(description="Differential check of the reasoning backends against the truth-table oracle.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--max-atoms", type=int, default=3)
+    parser.add_argument("--max-beliefs", type=int, default=4)
+    parser.add_argument("--max-depth", type=int, default=2)
+    args = parser.parse_args()
+
+    report = run_harness(args.seed, args.cases, args.max_atoms, args.max_beliefs, args.max_depth)
+    print(report)
+    return 1 if report.failures else 0
+
+# Run the harness if the program is executed directly
+if __name__ == "__main__":
+    raise SystemExit(main())
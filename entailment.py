@@ -1,4 +1,4 @@
-from typing import List, Set, FrozenSet
+from typing import Dict, List, Set, FrozenSet
 from belief_base import Atom, And, Or, Not, Implies, BeliefBase, Belief
 import itertools
 from belief_base import Biconditional
@@ -143,17 +143,32 @@ def to_cnf_obj(formula) -> List[Set[str]]:
 
 # Function to check entailment of a formula from a belief base using resolution
 def check_entailment(belief_base: BeliefBase, query) -> bool:
-    # Extract CNF clauses from each formula in the belief base
-    kb_clauses = []
-    for belief in belief_base.beliefs:
-        kb_clauses.extend(to_cnf_obj(belief.formula))
+    # Get the simplified CNF clauses of the belief base
+    kb_clauses = belief_base.optimize()
 
     # Add query negation, transformed into CNF
     negated_query = Not(query)
     query_clauses = to_cnf_obj(negated_query)
 
-    # Combine clauses from belief base and negated query
-    clause_set = {frozenset(clause) for clause in kb_clauses + query_clauses}
+    # Combine clauses from belief base and negated query, then refute them
+    return refutes(set(kb_clauses), query_clauses)
+
+# Function to check whether a set of clauses together with the negated query clauses is unsatisfiable
+def refutes(kb_clauses: Set[FrozenSet[str]], query_clauses: List[Set[str]]) -> bool:
+    """
+    kb_clauses: clauses of the premises (e.g., already compiled beliefs)
+    query_clauses: CNF clauses of the negated query
+    Lets callers compile the premises and the negated query once and reuse them across
+    many entailment checks (e.g., one per subset of a belief base).
+    """
+    clause_set = set(kb_clauses) | {
+        frozenset(clause) for clause in query_clauses if not is_tautological_clause(frozenset(clause))
+    }
+
+    # Clauses with a pure literal can always be satisfied, so they never take part in a refutation
+    clause_set = eliminate_pure_literals(clause_set)
+    if frozenset() in clause_set:
+        return True
 
     # Perform resolution to check if the clause set is unsatisfiable
     return resolution(clause_set)
@@ -189,13 +204,160 @@ def resolve(clause1: Set[str], clause2: Set[str]) -> Set[FrozenSet[str]]:
         for l2 in clause2:
             if l1 == negate(l2):
                 # Resolving literals that are negations of each other
-                new_clause = (clause1 | clause2) - {l1, l2}
+                new_clause = (clause1 - {l1}) | (clause2 - {l2})
                 # Ensure no contradiction occurs (no literal and its negation in the new clause)
                 if not any(lit in new_clause and negate(lit) in new_clause for lit in new_clause):
                     resolvents.add(frozenset(new_clause))
 
     return resolvents
 
+# Helper function to get the atom of a literal (e.g., "~A" becomes "A")
+def literal_atom(literal: str) -> str:
+    return literal[1:] if literal.startswith('~') else literal
+
+# Function to check if a clause contains a literal and its negation (and is therefore always true)
+def is_tautological_clause(clause: FrozenSet[str]) -> bool:
+    return any(negate(literal) in clause for literal in clause)
+
+# Class simplifying a clause set incrementally while tracking the beliefs each clause comes from
+class ClauseSimplifier:
+    """
+    Keeps a simplified, logically equivalent version of every clause added to it.
+    Each clause is mapped to the beliefs it was derived from. Applies tautology removal,
+    unit propagation, clause subsumption and equivalent-literal substitution.
+    Clauses are indexed by literal, so adding a clause only touches the clauses that
+    share a literal with it, and later additions reuse all earlier work.
+    """
+    def __init__(self):
+        self.clauses = {}  # Simplified clause -> beliefs it was derived from
+        self.occurrences = {}  # Literal -> clauses containing it
+        self.units = {}  # Literal of each unit clause -> beliefs it was derived from
+        self.substitutions = {}  # Eliminated atom -> (literal it is equivalent to, beliefs this was derived from)
+        self.definitions = {}  # Binary clauses defining the substitutions -> beliefs they were derived from
+        self.contradiction = None  # Beliefs the empty clause was derived from, once it is derived
+
+    # Add a clause and propagate its consequences
+    def add(self, clause, origin):
+        pending = [(frozenset(clause), origin)]
+        while pending and self.contradiction is None:
+            clause, origin = pending.pop()
+            self._insert(clause, origin, pending)
+
+    # Get the simplified clause set, each clause mapped to the beliefs it was derived from
+    def result(self) -> Dict[FrozenSet[str], FrozenSet[Belief]]:
+        if self.contradiction is not None:
+            # The clause set is contradictory, the empty clause alone is equivalent to it
+            return {frozenset(): self.contradiction}
+        return {**self.clauses, **self.definitions}
+
+    # Rewrite a literal whose atom was substituted by an equivalent literal
+    def _substitute(self, literal):
+        origin = frozenset()
+        while literal_atom(literal) in self.substitutions:
+            replacement, reason = self.substitutions[literal_atom(literal)]
+            literal = negate(replacement) if literal.startswith('~') else replacement
+            origin |= reason
+        return literal, origin
+
+    # Simplify a clause against the current state and store it, queueing the clauses it affects
+    def _insert(self, clause, origin, pending):
+        literals = set()
+        for literal in clause:
+            literal, reason = self._substitute(literal)
+            literals.add(literal)
+            origin |= reason
+
+        # Unit propagation: a unit clause L satisfies every clause containing L and removes ¬L elsewhere
+        if any(literal in self.units for literal in literals):
+            return
+        for literal in list(literals):
+            if negate(literal) in self.units:
+                literals.discard(literal)
+                origin |= self.units[negate(literal)]
+        clause = frozenset(literals)
+
+        # Tautology removal: clauses such as A ∨ ¬A are always true
+        if is_tautological_clause(clause):
+            return
+        if not clause:
+            self.contradiction = origin
+            return
+
+        # Subsumption: drop the clause if a clause it contains is known, otherwise drop the clauses containing it
+        if clause in self.definitions or self._subsumed(clause):
+            return
+        for other in self._supersets(clause):
+            self._remove(other)
+        self._store(clause, origin)
+
+        if len(clause) == 1:
+            literal = next(iter(clause))
+            self.units[literal] = origin
+            # Clauses containing ¬L are shortened (clauses containing L were subsumed above)
+            for other in list(self.occurrences.get(negate(literal), ())):
+                pending.append((other, self._remove(other)))
+        elif len(clause) == 2:
+            # Equivalent-literal substitution: the binary clauses P ∨ Q and ¬P ∨ ¬Q make Q equivalent to ¬P
+            p, q = sorted(clause, key=literal_atom)
+            mirror = frozenset({negate(p), negate(q)})
+            if mirror in self.clauses:
+                self._substitute_atom(clause, mirror, p, q, pending)
+
+    # Replace the atom of q (the larger one) by ¬p in every clause, keeping the two defining clauses aside
+    def _substitute_atom(self, clause, mirror, p, q, pending):
+        atom = literal_atom(q)
+        replacement = negate(p) if q == atom else p  # The literal equivalent to the positive atom
+        reason = self.clauses[clause] | self.clauses[mirror]
+        for definition in (clause, mirror):
+            self.definitions[definition] = self._remove(definition)
+        self.substitutions[atom] = (replacement, reason)
+
+        # Clauses mentioning the atom are re-inserted, which rewrites them
+        for literal in (atom, negate(atom)):
+            for other in list(self.occurrences.get(literal, ())):
+                pending.append((other, self._remove(other)))
+
+    # Check whether a known clause is a subset of 'clause'
+    def _subsumed(self, clause):
+        for literal in clause:
+            for other in self.occurrences.get(literal, ()):
+                if other <= clause:
+                    return True
+        return False
+
+    # Get the known clauses that strictly contain 'clause'
+    def _supersets(self, clause):
+        smallest = min((self.occurrences.get(literal, set()) for literal in clause), key=len)
+        return [other for other in smallest if clause < other]
+
+    def _store(self, clause, origin):
+        self.clauses[clause] = origin
+        for literal in clause:
+            self.occurrences.setdefault(literal, set()).add(clause)
+
+    def _remove(self, clause):
+        origin = self.clauses.pop(clause)
+        for literal in clause:
+            self.occurrences[literal].discard(clause)
+        if len(clause) == 1:
+            self.units.pop(next(iter(clause)), None)
+        return origin
+
+# Function to remove clauses containing a pure literal (one whose negation appears in no clause)
+def eliminate_pure_literals(clauses: Set[FrozenSet[str]]) -> Set[FrozenSet[str]]:
+    """
+    Removing clauses with a pure literal preserves satisfiability (the literal can be made true),
+    so it is only valid when the whole clause set is checked for unsatisfiability, as in
+    check_entailment, and not on the belief base alone.
+    """
+    clauses = set(clauses)
+    while True:
+        literals = {literal for clause in clauses for literal in clause}
+        pure = {literal for literal in literals if negate(literal) not in literals}
+        if not pure:
+            return clauses
+        clauses = {clause for clause in clauses if not (clause & pure)}
+
 # Function to check if two formulas are logically equivalent in the context of a belief base
 def logically_equivalent(belief_base: BeliefBase, phi, psi) -> bool:
     """
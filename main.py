@@ -1,5 +1,5 @@
 from belief_base import BeliefBase, Atom, And, Or, Not, Implies
-from contraction import partial_meet_contraction
+from contraction import partial_meet_contraction, package_contraction
 import re
 
 # Function to parse the input formula
@@ -114,10 +114,13 @@ def main():
 
         elif choice == "3":
             # Contract the belief base by removing a formula
-            raw = input("Enter formula to contract: ")
+            raw = input("Enter formula to contract (separate several formulas with ;): ")
             try:
-                formula = parse_input_formula(raw)  # Parse the formula
-                new_beliefs = partial_meet_contraction(belief_base, formula)  # Perform the contraction
+                formulas = [parse_input_formula(part) for part in raw.split(";") if part.strip()]  # Parse the formulas
+                if len(formulas) == 1:
+                    new_beliefs = partial_meet_contraction(belief_base, formulas[0])  # Perform the contraction
+                else:
+                    new_beliefs = package_contraction(belief_base, formulas)  # Contract all formulas at once
                 belief_base.beliefs = list(new_beliefs)  # Update the belief base
                 print("Belief base contracted.")  # Confirm the contraction
             except Exception as e:
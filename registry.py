@@ -0,0 +1,379 @@
+import threading
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from belief_base import BeliefBase, Atom, And, Or, Not, Implies, Biconditional
+from contraction import partial_meet_contraction
+from entailment import check_entailment, to_cnf_obj
+
+# Class storing each distinct formula once, so that bases sharing formulas share their nodes
+class FormulaTable:
+    """
+    Interns formulas (hash-consing): structurally identical formulas are mapped to one
+    shared node. Because interned nodes are shared, per-node caches such as the compiled
+    evaluators of compile_formula and the entries of ClauseCache are shared as well.
+    Nodes are held weakly: a node is dropped once no belief base or cache refers to it.
+    """
+    def __init__(self):
+        self.nodes = weakref.WeakValueDictionary()  # Structural key -> shared formula node
+        self.lock = threading.Lock()
+
+    # Get the shared node for a formula, interning its sub-formulas first
+    def intern(self, formula):
+        if isinstance(formula, Atom):
+            key = (Atom, formula.name)
+            build = lambda: formula
+        elif isinstance(formula, Not):
+            operand = self.intern(formula.operand)
+            key = (Not, id(operand))
+            build = lambda: Not(operand)
+        elif isinstance(formula, (And, Or)):
+            operands = tuple(self.intern(op) for op in formula.operands)
+            key = (type(formula), tuple(id(op) for op in operands))
+            build = lambda: type(formula)(*operands)
+        elif isinstance(formula, Implies):
+            antecedent, consequent = self.intern(formula.antecedent), self.intern(formula.consequent)
+            key = (Implies, id(antecedent), id(consequent))
+            build = lambda: Implies(antecedent, consequent)
+        elif isinstance(formula, Biconditional):
+            left, right = self.intern(formula.left), self.intern(formula.right)
+            key = (Biconditional, id(left), id(right))
+            build = lambda: Biconditional(left, right)
+        else:
+            raise TypeError(f"Unsupported formula type: {type(formula)}")
+
+        # A node keeps its operands alive, so the ids in the key of a live node stay unique
+        with self.lock:
+            node = self.nodes.get(key)
+            if node is None:
+                node = build()
+                self.nodes[key] = node
+            return node
+
+    def __len__(self):
+        return len(self.nodes)
+
+# Class caching the CNF clauses of interned formulas for all tenants, with per-tenant quotas
+class ClauseCache:
+    """
+    Global cache of compiled CNF clauses, keyed on interned formula nodes.
+    Every entry is stored once. An entry used by a single tenant is charged to that tenant;
+    an entry used by several tenants is shared and charged to none of them, so one tenant's
+    quota cannot evict the clauses other tenants rely on.
+    When a tenant is charged more than 'tenant_quota' entries, its least recently used
+    entries are evicted; when the cache holds more than 'max_entries', the least recently
+    used entries overall are evicted.
+    """
+    def __init__(self, max_entries=10000, tenant_quota=1000):
+        self.max_entries = max_entries  # Maximum number of cached formulas, over all tenants
+        self.tenant_quota = tenant_quota  # Maximum number of cached formulas charged to one tenant
+        self.entries = OrderedDict()  # Formula node -> (clauses, set of tenants using it), in LRU order
+        self.owned = {}  # Tenant -> OrderedDict of the formula nodes charged to it, in LRU order
+        self.shared = OrderedDict()  # Formula nodes used by several tenants, in LRU order
+        self.hits = {}  # Tenant -> number of cache hits
+        self.misses = {}  # Tenant -> number of cache misses
+        self.lock = threading.Lock()
+
+    # Get the clauses of a formula on behalf of a tenant, compiling them on a miss
+    def clauses(self, tenant, formula, view=None):
+        with self.lock:
+            if view is not None and view.released:
+                # A task of a removed tenant is still running: compile without caching or charging it
+                return tuple(frozenset(clause) for clause in to_cnf_obj(formula))
+            if formula in self.entries:
+                self.hits[tenant] = self.hits.get(tenant, 0) + 1
+                return self._use(tenant, formula)
+            self.misses[tenant] = self.misses.get(tenant, 0) + 1
+
+        # Compile outside the lock, other tenants can keep using the cache meanwhile
+        clauses = tuple(frozenset(clause) for clause in to_cnf_obj(formula))
+
+        with self.lock:
+            if view is not None and view.released:
+                return clauses  # The tenant was removed meanwhile
+            if formula in self.entries:
+                # Another tenant compiled it meanwhile
+                return self._use(tenant, formula)
+            self.entries[formula] = (clauses, {tenant})
+            self._charge(tenant, formula)
+            while len(self.entries) > self.max_entries:
+                self._evict(next(iter(self.entries)))
+        return clauses
+
+    # Get the number of cached formulas charged to a tenant
+    def owned_by(self, tenant):
+        with self.lock:
+            return len(self.owned.get(tenant, ()))
+
+    # Get the cache statistics of a tenant
+    def usage(self, tenant):
+        with self.lock:
+            return {
+                "cached_formulas": len(self.owned.get(tenant, ())),
+                "shared_formulas": sum(1 for formula in self.shared if tenant in self.entries[formula][1]),
+                "clause_cache_hits": self.hits.get(tenant, 0),
+                "clause_cache_misses": self.misses.get(tenant, 0),
+            }
+
+    # Drop the entries charged to a tenant (e.g., when its belief base is removed)
+    def release(self, tenant, view=None):
+        with self.lock:
+            if view is not None:
+                view.released = True  # Later lookups through the view must not charge the tenant again
+            for formula in self.owned.pop(tenant, ()):
+                del self.entries[formula]
+            # Shared entries stay cached for the other tenants, and go back to a single tenant's charge
+            for formula in list(self.shared):
+                users = self.entries[formula][1]
+                if tenant in users:
+                    users.discard(tenant)
+                    if len(users) == 1:
+                        del self.shared[formula]
+                        self._charge(next(iter(users)), formula)
+            self.hits.pop(tenant, None)
+            self.misses.pop(tenant, None)
+
+    # Record a tenant's use of a cached entry and return its clauses (called with the lock held)
+    def _use(self, tenant, formula):
+        clauses, users = self.entries[formula]
+        self.entries.move_to_end(formula)
+        if tenant not in users:
+            users.add(tenant)
+            if len(users) == 2:
+                # Second tenant: the entry is no longer charged to the first one
+                (owner,) = users - {tenant}
+                del self.owned[owner][formula]
+                self.shared[formula] = None
+        if len(users) > 1:
+            self.shared.move_to_end(formula)
+        else:
+            self.owned[tenant].move_to_end(formula)
+        return clauses
+
+    # Charge an entry to a tenant, evicting its least recently used entries over quota (lock held)
+    def _charge(self, tenant, formula):
+        owned = self.owned.setdefault(tenant, OrderedDict())
+        owned[formula] = None
+        while len(owned) > self.tenant_quota:
+            self._evict(next(iter(owned)))
+
+    # Remove one entry (called with the lock held)
+    def _evict(self, formula):
+        _, users = self.entries.pop(formula)
+        if len(users) > 1:
+            del self.shared[formula]
+        else:
+            del self.owned[next(iter(users))][formula]
+
+# View of the shared clause cache for one tenant, plugged into BeliefBase.clause_cache
+class TenantClauseCache:
+    def __init__(self, cache, tenant):
+        self.cache = cache  # The shared ClauseCache
+        self.tenant = tenant  # Name of the tenant the lookups are charged to
+        self.released = False  # Set once the tenant is removed, lookups are then no longer cached
+
+    # Get the clauses of a formula from the shared cache
+    def clauses(self, formula):
+        return self.cache.clauses(self.tenant, formula, self)
+
+    # Drop the tenant's entries and stop caching the lookups made through this view
+    def release(self):
+        self.cache.release(self.tenant, self)
+
+# Class running reasoning tasks on a bounded pool of threads, scheduling tenants fairly
+class ReasoningExecutor:
+    """
+    Runs tasks on at most 'max_workers' threads. Each tenant has its own queue and the
+    tenants are served round-robin, so a tenant submitting many tasks cannot starve the
+    others. At most one task per tenant runs at a time, which also keeps each belief
+    base free of concurrent modifications.
+    """
+    def __init__(self, max_workers=4):
+        self.queues = OrderedDict()  # Tenant -> deque of pending tasks, in round-robin order
+        self.running = set()  # Tenants with a task in progress
+        self.condition = threading.Condition()
+        self.shutting_down = False
+        self.workers = [threading.Thread(target=self._work, daemon=True) for _ in range(max_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    # Queue a task for a tenant and return a Future for its result
+    def submit(self, tenant, function, *args, **kwargs):
+        future = Future()
+        with self.condition:
+            if self.shutting_down:
+                raise RuntimeError("Cannot submit tasks after shutdown.")
+            self.queues.setdefault(tenant, deque()).append((future, function, args, kwargs))
+            self.condition.notify()
+        return future
+
+    # Cancel the queued tasks of a tenant, returning how many were cancelled (a running task completes)
+    def cancel(self, tenant):
+        with self.condition:
+            queue = self.queues.pop(tenant, ())
+        for future, _, _, _ in queue:
+            future.cancel()
+        return len(queue)
+
+    # Stop accepting tasks, optionally waiting for the queued ones to finish
+    def shutdown(self, wait=True):
+        with self.condition:
+            self.shutting_down = True
+            self.condition.notify_all()
+        if wait:
+            for worker in self.workers:
+                worker.join()
+
+    # Take the next task of the first tenant in round-robin order that is not busy (lock held)
+    def _next_task(self):
+        for tenant in self.queues:
+            if tenant in self.running:
+                continue
+            queue = self.queues.pop(tenant)
+            task = queue.popleft()
+            if queue:
+                self.queues[tenant] = queue  # Back of the line until the other tenants had a turn
+            self.running.add(tenant)
+            return tenant, task
+        return None
+
+    # Worker loop: run tasks until shutdown and no task is left
+    def _work(self):
+        while True:
+            with self.condition:
+                while True:
+                    next_task = self._next_task()
+                    if next_task is not None:
+                        break
+                    if self.shutting_down and not self.queues:
+                        return
+                    self.condition.wait()
+
+            tenant, (future, function, args, kwargs) = next_task
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = function(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+
+            with self.condition:
+                self.running.discard(tenant)
+                self.condition.notify_all()
+
+# Class managing many named belief bases in one process
+class BeliefBaseRegistry:
+    """
+    Hosts one BeliefBase per tenant (user or agent). All tenants share one FormulaTable,
+    so common formulas are stored once, one ClauseCache, so their CNF is computed once,
+    and one ReasoningExecutor, so reasoning runs on a bounded number of threads.
+    Memory thus grows with the number of distinct formulas rather than with
+    tenants × formulas.
+    """
+    def __init__(self, max_workers=4, max_cached_formulas=10000, tenant_quota=1000):
+        self.formulas = FormulaTable()
+        self.clause_cache = ClauseCache(max_cached_formulas, tenant_quota)
+        self.executor = ReasoningExecutor(max_workers)
+        self.bases = {}  # Tenant -> BeliefBase
+        self.locks = {}  # Tenant -> lock guarding its belief base
+        self.counters = {}  # Tenant -> operation counters
+        self.lock = threading.Lock()
+
+    # Create an empty belief base for a new tenant
+    def create(self, tenant):
+        with self.lock:
+            if tenant in self.bases:
+                raise ValueError(f"Tenant already exists: {tenant}")
+            base = BeliefBase()
+            base.clause_cache = TenantClauseCache(self.clause_cache, tenant)
+            self.bases[tenant] = base
+            self.locks[tenant] = threading.Lock()
+            self.counters[tenant] = {
+                "expansions": 0,
+                "entailment_checks": 0,
+                "contractions": 0,
+                "tasks_submitted": 0,
+                "tasks_completed": 0,
+            }
+            return base
+
+    # Get the belief base of a tenant
+    def get(self, tenant):
+        return self.bases[tenant]
+
+    # Remove a tenant, cancel its queued tasks and release its share of the clause cache
+    def remove(self, tenant):
+        with self.lock:
+            base = self.bases.pop(tenant)
+            del self.locks[tenant]
+            del self.counters[tenant]
+        self.executor.cancel(tenant)
+        # A task already running keeps the base, its lookups must not be charged to the tenant any more
+        base.clause_cache.release()
+
+    # Names of all tenants
+    def tenants(self):
+        with self.lock:
+            return list(self.bases)
+
+    # Expand a tenant's belief base with a formula, sharing its nodes with the other tenants
+    def expand(self, tenant, formula, priority=0):
+        formula = self.formulas.intern(formula)
+        with self.locks[tenant]:
+            self.bases[tenant].expand(formula, priority)
+            self.counters[tenant]["expansions"] += 1
+
+    # Check entailment on a tenant's belief base, on the shared executor
+    def check_entailment(self, tenant, query):
+        query = self.formulas.intern(query)
+        return self.submit(tenant, self._check_entailment, *self._tenant(tenant), query)
+
+    # Contract a tenant's belief base by a formula, on the shared executor
+    def contract(self, tenant, formula):
+        formula = self.formulas.intern(formula)
+        return self.submit(tenant, self._contract, *self._tenant(tenant), formula)
+
+    # Run any task for a tenant on the shared executor
+    def submit(self, tenant, function, *args, **kwargs):
+        with self.lock:
+            counters = self.counters[tenant]
+            counters["tasks_submitted"] += 1
+
+        def task():
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self.lock:
+                    counters["tasks_completed"] += 1
+
+        return self.executor.submit(tenant, task)
+
+    # Get the statistics of a tenant
+    def stats(self, tenant):
+        base = self.bases[tenant]
+        with self.lock:
+            stats = dict(self.counters[tenant])
+        stats["beliefs"] = len(base.beliefs)
+        stats.update(self.clause_cache.usage(tenant))
+        return stats
+
+    # Stop the shared executor
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait)
+
+    # Get the belief base, lock and counters of a tenant (tasks hold on to them, the tenant may be removed)
+    def _tenant(self, tenant):
+        with self.lock:
+            return self.bases[tenant], self.locks[tenant], self.counters[tenant]
+
+    def _check_entailment(self, base, lock, counters, query):
+        with lock:
+            counters["entailment_checks"] += 1
+            return check_entailment(base, query)
+
+    def _contract(self, base, lock, counters, formula):
+        with lock:
+            counters["contractions"] += 1
+            base.beliefs = list(partial_meet_contraction(base, formula))
+            return base.beliefs
@@ -0,0 +1,422 @@
+import gc
+import itertools
+import threading
+import unittest
+from unittest import mock
+from belief_base import BeliefBase, Belief, Atom, And, Or, Not, Implies, Biconditional, compile_formula, bind_formula
+from contraction import partial_meet_contraction, package_contraction, contraction_cache, canonical_query, ContractionCache
+from entailment import check_entailment, ClauseSimplifier
+from registry import BeliefBaseRegistry, ClauseCache, FormulaTable, ReasoningExecutor
+from differential_harness import run_harness, CONTRACTION_BACKENDS
+
+
+class TestContractionCache(unittest.TestCase):
+    # Setup method to start every test from an empty contraction cache
+    def setUp(self):
+        contraction_cache.clear()
+        self.base = BeliefBase()
+        self.base.expand(Atom("A"))
+        self.base.expand(Atom("B"))
+
+    # Test that reordered operands share the same canonical form
+    def test_canonical_query_ignores_operand_order(self):
+        self.assertEqual(canonical_query(And(Atom("A"), Atom("B"))),
+                         canonical_query(And(Atom("B"), Atom("A"))))
+
+    # Test that repeated and syntactically equivalent contractions are answered from the cache
+    def test_equivalent_queries_hit_cache(self):
+        first = partial_meet_contraction(self.base, And(Atom("A"), Atom("B")))
+        second = partial_meet_contraction(self.base, And(Atom("B"), Atom("A")))
+        self.assertEqual(set(first), set(second))
+        self.assertEqual(contraction_cache.misses, 1)
+        self.assertEqual(contraction_cache.hits, 1)
+
+    # Test that logically equivalent queries with different CNF are found by the equivalence check
+    def test_semantically_equivalent_query_hits_cache(self):
+        first = partial_meet_contraction(self.base, Atom("A"))
+        second = partial_meet_contraction(self.base, And(Or(Atom("A"), Atom("B")), Or(Atom("A"), Not(Atom("B")))))
+        self.assertEqual(set(first), set(second))
+        self.assertEqual(contraction_cache.equivalence_hits, 1)
+
+    # Test that changing the belief base invalidates cached results
+    def test_expansion_changes_cache_key(self):
+        partial_meet_contraction(self.base, Atom("A"))
+        self.base.expand(Implies(Atom("B"), Atom("A")))
+        partial_meet_contraction(self.base, Atom("A"))
+        self.assertEqual(contraction_cache.misses, 2)
+        self.assertEqual(contraction_cache.hits, 0)
+
+    # Test that the cache does not keep belief bases alive
+    def test_cache_holds_bases_weakly(self):
+        partial_meet_contraction(self.base, Atom("A"))
+        self.assertEqual(len(contraction_cache.bases), 1)
+        del self.base
+        gc.collect()
+        self.assertEqual(len(contraction_cache.bases), 0)
+
+    # Test that a contraction returns a set whether or not it was cached
+    def test_result_type_is_stable(self):
+        tautology = Or(Atom("A"), Not(Atom("A")))  # No remainders
+        self.assertIsInstance(partial_meet_contraction(self.base, tautology), set)
+        self.assertIsInstance(partial_meet_contraction(self.base, tautology), set)
+
+
+class TestClauseSimplification(unittest.TestCase):
+    # Test that tautologies, duplicates and subsumed clauses are pruned from the compiled base
+    def test_redundant_beliefs_are_pruned(self):
+        base = BeliefBase()
+        base.expand(Atom("A"))
+        base.expand(Or(Atom("A"), Atom("B")))  # Subsumed by A
+        base.expand(Or(Atom("C"), Not(Atom("C"))))  # Tautology
+        base.expand(Atom("A"))  # Duplicate
+        self.assertEqual(set(base.optimize()), {frozenset({"A"})})
+
+    # Test that unit propagation shortens clauses and records the beliefs they come from
+    def test_unit_propagation_tracks_origin(self):
+        base = BeliefBase()
+        base.expand(Atom("A"))
+        base.expand(Implies(Atom("A"), Atom("B")))
+        clauses = base.optimize()
+        self.assertEqual(set(clauses), {frozenset({"A"}), frozenset({"B"})})
+        self.assertEqual(set(clauses[frozenset({"B"})]), set(base.beliefs))
+
+    # Test that equivalent literals are substituted by a single representative
+    def test_equivalent_literal_substitution(self):
+        simplifier = ClauseSimplifier()
+        for clause in ({"~A", "B"}, {"A", "~B"}, {"B", "C"}):
+            simplifier.add(clause, frozenset())
+        clauses = simplifier.result()
+        self.assertIn(frozenset({"A", "C"}), clauses)
+        self.assertNotIn(frozenset({"B", "C"}), clauses)
+
+    # Test that the simplified clauses follow later expansions and keep entailment unchanged
+    def test_incremental_optimization_after_expansion(self):
+        base = BeliefBase()
+        base.expand(Implies(Atom("A"), Atom("B")))
+        self.assertFalse(check_entailment(base, Atom("B")))
+        base.expand(Atom("A"))
+        self.assertEqual(base.simplified_beliefs, len(base.beliefs))
+        self.assertEqual(base.optimized_version, base.version)
+        self.assertTrue(check_entailment(base, Atom("B")))
+
+    # Test that an equivalence found by a later expansion rewrites the clauses simplified earlier
+    def test_incremental_substitution_rewrites_earlier_clauses(self):
+        base = BeliefBase()
+        base.expand(Or(Atom("B"), Atom("C")))
+        base.expand(Or(Atom("B"), Atom("D")))
+        base.optimize()
+        base.expand(Biconditional(Atom("A"), Atom("B")))
+        clauses = base.optimize()
+        self.assertIn(frozenset({"A", "C"}), clauses)
+        self.assertIn(frozenset({"A", "D"}), clauses)
+        self.assertNotIn(frozenset({"B", "C"}), clauses)
+        self.assertEqual(set(clauses[frozenset({"A", "C"})]), {base.beliefs[0], base.beliefs[2]})
+
+
+class TestCompiledEvaluation(unittest.TestCase):
+    # Test that the compiled evaluator agrees with the recursive evaluate() on every model
+    def test_compiled_formula_matches_evaluate(self):
+        A, B, C = Atom("A"), Atom("B"), Atom("C")
+        formula = Biconditional(Implies(A, Or(B, Not(C))), And(C, Not(A)))
+        atoms = ("C", "D", "A", "B")  # Any atom order, including atoms the formula does not use
+        evaluator, projection = bind_formula(formula, {atom: i for i, atom in enumerate(atoms)})
+        for values in itertools.product([True, False], repeat=len(atoms)):
+            model = dict(zip(atoms, values))
+            self.assertEqual(evaluator(values, projection), formula.evaluate(model))
+
+    # Test that a formula is compiled once, whatever the atom orders it is evaluated over
+    def test_compiled_formula_is_cached_once(self):
+        formula = And(Atom("A"), Atom("B"))
+        first, _ = bind_formula(formula, {"A": 0, "B": 1})
+        second, projection = bind_formula(formula, {"C": 0, "B": 1, "A": 2})
+        self.assertIs(first, second)
+        self.assertEqual(projection, (2, 1))
+        self.assertEqual(compile_formula(formula)[0], ("A", "B"))
+
+    # Test that formulas too deep for the Python parser still evaluate correctly
+    def test_deep_formula_falls_back_to_evaluate(self):
+        formula = Atom("A")
+        for _ in range(300):
+            formula = Not(formula)
+        evaluator, projection = bind_formula(formula, {"B": 0, "A": 1})
+        self.assertTrue(evaluator((False, True), projection))
+
+    # Test that evaluating a base model by model binds its beliefs once, until the base changes
+    def test_bound_evaluators_are_reused_across_models(self):
+        base = BeliefBase()
+        base.expand(Implies(Atom("A"), Atom("B")))
+        base.expand(Or(Atom("B"), Atom("C")))
+        models = [dict(zip("CBA", values)) for values in itertools.product([True, False], repeat=3)]
+        with mock.patch("belief_base.bind_formula", wraps=bind_formula) as bind:
+            for model in models:
+                expected = [belief.formula.evaluate(model) for belief in base.beliefs]
+                self.assertEqual(base.evaluate_all(model), all(expected))
+                self.assertEqual(base.evaluate_any(model), any(expected))
+            self.assertEqual(bind.call_count, 2)
+            model = {"C": False, "B": True, "A": True}
+            self.assertTrue(base.evaluate_all(model))
+            base.expand(Atom("C"))
+            self.assertFalse(base.evaluate_all(model))  # Rebound after the expansion
+
+
+class TestCompactBeliefStore(unittest.TestCase):
+    # Setup method to initialize a belief base with explicit priorities
+    def setUp(self):
+        self.base = BeliefBase()
+        self.base.expand(Atom("A"), 1.5)
+        self.base.expand(Atom("B"), 2.0)
+        self.base.expand(Atom("A"), 4.0)
+
+    # Test that beliefs do not carry a per-instance __dict__
+    def test_belief_has_slots(self):
+        self.assertFalse(hasattr(Belief(Atom("A")), "__dict__"))
+
+    # Test that the beliefs cannot be changed behind the belief base's back
+    def test_beliefs_are_read_only(self):
+        self.assertIsInstance(self.base.beliefs, tuple)
+        self.base.beliefs = self.base.beliefs[1:]
+        self.assertEqual([b.priority for b in self.base.beliefs], [2.0, 4.0])
+        self.assertEqual(self.base.priority_of_mask(0b11), 6.0)
+
+    # Test that subsets round-trip through bitmasks and their priorities are summed
+    def test_bitmask_subsets(self):
+        subset = {self.base.beliefs[0], self.base.beliefs[2]}
+        mask = self.base.mask_of(subset)
+        self.assertEqual(mask, 0b101)
+        self.assertEqual(self.base.subset_of(mask), subset)
+        self.assertEqual(self.base.priority_of_mask(mask), 5.5)
+
+
+class TestPackageContraction(unittest.TestCase):
+    # Setup method to initialize a belief base with some beliefs before each test
+    def setUp(self):
+        self.base = BeliefBase()
+        self.base.expand(Atom("A"))
+        self.base.expand(Implies(Atom("A"), Atom("B")))
+        self.base.expand(Atom("C"))
+
+    # Test that none of the contracted formulas is entailed afterwards
+    def test_package_success(self):
+        contracted = package_contraction(self.base, [Atom("B"), Atom("C")])
+        new_base = BeliefBase()
+        new_base.beliefs = list(contracted)
+        self.assertFalse(check_entailment(new_base, Atom("B")))
+        self.assertFalse(check_entailment(new_base, Atom("C")))
+        self.assertTrue(all(b in self.base.beliefs for b in contracted))
+
+    # Test that the result does not depend on the order of the formulas
+    def test_package_order_independence(self):
+        first = package_contraction(self.base, [Atom("B"), Atom("C")])
+        second = package_contraction(self.base, [Atom("C"), Atom("B")])
+        self.assertEqual(set(first), set(second))
+
+    # Test that a package of one formula behaves like partial meet contraction
+    def test_single_formula_package(self):
+        contraction_cache.clear()
+        self.assertEqual(set(package_contraction(self.base, [Atom("B")])),
+                         set(partial_meet_contraction(self.base, Atom("B"))))
+
+    # Test that tautologies in the package are ignored
+    def test_tautologies_are_ignored(self):
+        contracted = package_contraction(self.base, [Or(Atom("A"), Not(Atom("A")))])
+        self.assertEqual(set(contracted), set(self.base.beliefs))
+
+
+class TestBeliefBaseRegistry(unittest.TestCase):
+    # Setup method to create a registry with two tenants sharing a rule
+    def setUp(self):
+        self.registry = BeliefBaseRegistry(max_workers=2)
+        for tenant in ("alice", "bob"):
+            self.registry.create(tenant)
+            self.registry.expand(tenant, Implies(Atom("A"), Atom("B")))
+
+    def tearDown(self):
+        self.registry.shutdown()
+
+    # Test that tenants share the nodes and compiled clauses of common formulas
+    def test_formulas_and_clauses_are_shared(self):
+        alice, bob = self.registry.get("alice"), self.registry.get("bob")
+        self.assertIs(alice.beliefs[0].formula, bob.beliefs[0].formula)
+        self.registry.check_entailment("alice", Atom("B")).result()
+        self.registry.check_entailment("bob", Atom("B")).result()
+        self.assertEqual(self.registry.stats("alice")["clause_cache_misses"], 1)
+        self.assertEqual(self.registry.stats("bob")["clause_cache_hits"], 1)
+        self.assertEqual(self.registry.stats("bob")["cached_formulas"], 0)
+        self.assertEqual(self.registry.stats("alice")["shared_formulas"], 1)
+
+    # Test reasoning on the shared executor and the per-tenant statistics
+    def test_entailment_and_contraction(self):
+        self.registry.expand("alice", Atom("A"))
+        self.assertTrue(self.registry.check_entailment("alice", Atom("B")).result())
+        self.registry.contract("alice", Atom("B")).result()
+        self.assertFalse(self.registry.check_entailment("alice", Atom("B")).result())
+        self.assertTrue(self.registry.check_entailment("bob", Implies(Atom("A"), Atom("B"))).result())
+        stats = self.registry.stats("alice")
+        self.assertEqual(stats["expansions"], 2)
+        self.assertEqual(stats["contractions"], 1)
+        self.assertEqual(stats["tasks_completed"], 3)
+
+    # Test that a tenant's cache entries are evicted once it exceeds its quota
+    def test_clause_cache_quota(self):
+        cache = ClauseCache(max_entries=10, tenant_quota=2)
+        formulas = [Atom("A"), Atom("B"), Atom("C")]
+        for formula in formulas:
+            cache.clauses("alice", formula)
+        self.assertEqual(cache.owned_by("alice"), 2)
+        self.assertNotIn(formulas[0], cache.entries)
+
+    # Test that entries used by several tenants are not evicted by one tenant's quota
+    def test_shared_entries_are_not_charged(self):
+        cache = ClauseCache(max_entries=10, tenant_quota=1)
+        shared = Atom("A")
+        cache.clauses("alice", shared)
+        cache.clauses("bob", shared)
+        cache.clauses("alice", Atom("B"))
+        cache.clauses("alice", Atom("C"))
+        self.assertIn(shared, cache.entries)
+        cache.release("bob")
+        self.assertIn(shared, cache.owned["alice"])  # Charged to the remaining tenant again
+
+    # Test that removing a tenant cancels its queued tasks
+    def test_remove_cancels_queued_tasks(self):
+        release = threading.Event()
+        self.registry.submit("alice", release.wait)
+        queued = self.registry.check_entailment("alice", Atom("B"))
+        self.registry.remove("alice")
+        release.set()
+        self.assertTrue(queued.cancelled())
+        self.assertEqual(self.registry.tenants(), ["bob"])
+
+    # Test that a task still running when its tenant is removed is no longer charged to the tenant
+    def test_remove_while_task_is_running(self):
+        base = self.registry.get("alice")
+        started, release = threading.Event(), threading.Event()
+
+        def task():
+            started.set()
+            release.wait()
+            base.expand(Atom("C"))
+            return check_entailment(base, Atom("B"))
+
+        future = self.registry.submit("alice", task)
+        started.wait()
+        self.registry.remove("alice")
+        release.set()
+        future.result()
+        cache = self.registry.clause_cache
+        self.assertNotIn("alice", cache.owned)
+        self.assertNotIn("alice", cache.misses)
+        self.registry.create("alice")
+        stats = self.registry.stats("alice")
+        self.assertEqual((stats["cached_formulas"], stats["clause_cache_misses"]), (0, 0))
+
+    # Test that interned nodes are dropped once nothing refers to them
+    def test_formula_table_releases_nodes(self):
+        table = FormulaTable()
+        node = table.intern(And(Atom("X"), Atom("Y")))
+        self.assertEqual(len(table), 3)
+        del node
+        gc.collect()
+        self.assertEqual(len(table), 0)
+
+    # Test that tenants are served round-robin
+    def test_executor_is_fair(self):
+        executor = ReasoningExecutor(max_workers=1)
+        release = threading.Event()
+        order = []
+        executor.submit("x", release.wait)
+        futures = [executor.submit("alice", order.append, f"alice{i}") for i in range(3)]
+        futures.append(executor.submit("bob", order.append, "bob0"))
+        release.set()
+        for future in futures:
+            future.result()
+        executor.shutdown()
+        self.assertEqual(order, ["alice0", "bob0", "alice1", "alice2"])
+
+
+class TestSubscriptions(unittest.TestCase):
+    # Setup method to watch the query B on a belief base containing A → B
+    def setUp(self):
+        self.base = BeliefBase()
+        self.base.expand(Implies(Atom("A"), Atom("B")))
+        self.notifications = []
+        self.subscription = self.base.subscribe(
+            Atom("B"), lambda query, entailed: self.notifications.append((str(query), entailed)))
+
+    # Test that subscribers are notified only when the entailment status flips
+    def test_notified_on_flip(self):
+        self.assertFalse(self.subscription.entailed)
+        self.base.expand(Atom("C"))
+        self.assertEqual(self.notifications, [])
+        self.base.expand(Atom("A"))
+        self.assertEqual(self.notifications, [("B", True)])
+
+    # Test that the contraction path used by main.py (replacing the beliefs) notifies subscribers
+    def test_notified_after_contraction(self):
+        self.base.expand(Atom("A"))
+        self.base.beliefs = list(partial_meet_contraction(self.base, Atom("B")))
+        self.assertEqual(self.notifications, [("B", True), ("B", False)])
+
+    # Test that unrelated changes are handled without re-running the entailment check
+    def test_unaffected_queries_are_skipped(self):
+        self.base.expand(Atom("A"))
+        with mock.patch.object(self.base, "_evaluate_subscription",
+                               wraps=self.base._evaluate_subscription) as evaluate:
+            self.base.expand(Atom("D"))  # Entailment is monotonic
+            self.base.beliefs = [b for b in self.base.beliefs if str(b.formula) != "D"]  # Not in the support
+            evaluate.assert_not_called()
+        self.assertTrue(self.subscription.entailed)
+
+    # Test that unsubscribed queries are no longer notified
+    def test_unsubscribe(self):
+        self.base.unsubscribe(self.subscription)
+        self.base.expand(Atom("A"))
+        self.assertEqual(self.notifications, [])
+
+
+class TestDifferentialHarness(unittest.TestCase):
+    # Test that every registered backend agrees with the truth-table oracle
+    def test_backends_agree_with_oracle(self):
+        report = run_harness(seed=0, cases=40)
+        self.assertEqual(report.failures, [], "\n".join(str(f) for f in report.failures))
+        self.assertIn("check_entailment", report.speedups())
+
+    # Test that a wrong backend is reported with a minimized case
+    def test_failures_are_minimized(self):
+        def always_entailed(belief_base, query):
+            return True
+
+        report = run_harness(seed=0, cases=20, entailment_backends={"broken": always_entailed},
+                             contraction_backends={})
+        self.assertEqual(len(report.failures), 1)
+        failure = report.failures[0]
+        self.assertEqual(failure.backend, "broken")
+        self.assertEqual(failure.minimized.beliefs, [])
+        self.assertLessEqual(failure.minimized.size(), failure.case.size())
+
+    # Test that a contraction backend breaking the postulates is caught
+    def test_contraction_failures_are_reported(self):
+        def keep_everything(belief_base, query):
+            return set(belief_base.beliefs)
+
+        report = run_harness(seed=0, cases=20, entailment_backends={},
+                             contraction_backends={"keep_everything": keep_everything})
+        self.assertEqual({f.backend for f in report.failures}, {"keep_everything"})
+        self.assertNotIn("keep_everything", CONTRACTION_BACKENDS)
+
+    # Test that repeated contractions reach the contraction cache, and that a false cache hit is caught
+    def test_contraction_cache_is_exercised(self):
+        backends = {"partial_meet_contraction": partial_meet_contraction}
+        report = run_harness(seed=0, cases=30, entailment_backends={}, contraction_backends=backends)
+        self.assertEqual(report.failures, [])
+        self.assertGreater(report.cache_stats["hits"], 0)
+        self.assertGreater(report.cache_stats["equivalence hits"], 0)
+
+        with mock.patch.object(ContractionCache, "_equivalent", staticmethod(lambda cached, canonical: True)):
+            report = run_harness(seed=0, cases=30, entailment_backends={}, contraction_backends=backends)
+        self.assertIn("repeated contractions", [f.check for f in report.failures])
+
+
+# Entry point for running the test cases
+if __name__ == "__main__":
+    unittest.main()